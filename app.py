@@ -5,10 +5,23 @@ A multi-user web interface for daily job searching and email notifications.
 """
 
 import os
-import json
+import re
+import sys
+import hmac
+import base64
+import fcntl
+import random
 import logging
 import secrets
+import traceback
+import ijson
+import orjson
+from collections import defaultdict
+from itertools import groupby
+from functools import lru_cache
+from cachetools import LRUCache, TTLCache
 from datetime import datetime, timedelta
+from email.header import Header
 
 # Force HTTPS for OAuth
 os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '0'
@@ -22,37 +35,119 @@ class ReverseProxied:
         if 'HTTP_X_FORWARDED_PROTO' in environ:
             environ['wsgi.url_scheme'] = environ['HTTP_X_FORWARDED_PROTO']
         return self.app(environ, start_response)
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, g
+from flask.json.provider import DefaultJSONProvider
+from jinja2 import FileSystemBytecodeCache
 from werkzeug.utils import secure_filename
 from flask_sqlalchemy import SQLAlchemy
+from flask_caching import Cache
+from sqlalchemy import delete, event, exists, func, insert, inspect, select, text, true
+from sqlalchemy.orm import make_transient_to_detached, raiseload
+from sqlalchemy.dialects.postgresql import JSONB, insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
 from googleapiclient.discovery import build
 import google.auth.transport.requests
+import httplib2
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 import atexit
 import threading
 import requests
 from bs4 import BeautifulSoup
 
+if __name__ == '__main__':
+    # Under `python app.py` make `import app` (the job store's 'app:...' references)
+    # return this module instead of executing a second copy of it
+    sys.modules.setdefault('app', sys.modules[__name__])
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class OrjsonProvider(DefaultJSONProvider):
+    """Serve jsonify/request.get_json through orjson's C encoder and parser
+
+    Output matches DefaultJSONProvider: datetimes are passed through to its
+    default() (RFC 822 http_date) and keys are sorted when sort_keys is set.
+    It is always compact; indent maps to OPT_INDENT_2. Calls with other
+    options (the session serializer's object_hook) keep the stdlib path.
+    """
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.pop('indent', None):
+            option |= orjson.OPT_INDENT_2
+        kwargs.pop('separators', None)
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+def _orjson_dumps(obj):
+    return orjson.dumps(obj).decode()
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', secrets.token_hex(32))
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///job_search.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_pre_ping': True,
+    # JSON columns (keywords, job_sites, custom_frequency) encode/decode via orjson
+    'json_serializer': _orjson_dumps,
+    'json_deserializer': orjson.loads
+}
+if app.config['SQLALCHEMY_DATABASE_URI'].startswith(('postgresql://', 'postgresql+psycopg2://')):
+    # psycopg2 fast execution helpers: batch executemany() into multi-row VALUES
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'].update({
+        'insertmanyvalues_page_size': 1000,
+        'executemany_mode': 'values_plus_batch'
+    })
+if app.config['SQLALCHEMY_DATABASE_URI'] != 'sqlite://' and ':memory:' not in app.config['SQLALCHEMY_DATABASE_URI']:
+    # Room for the scheduler's worker threads next to request handlers
+    # (in-memory SQLite keeps its single shared connection)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'].update({
+        'pool_size': 10,
+        'max_overflow': 20
+    })
+# SimpleCache is per process, so invalidate_dashboard() only clears the worker that
+# made the write; with several workers (or the scheduler in another one) use
+# CACHE_TYPE=RedisCache plus CACHE_REDIS_URL to share the cache and its invalidation
+app.config['CACHE_TYPE'] = os.environ.get('CACHE_TYPE', 'SimpleCache')
+app.config['CACHE_REDIS_URL'] = os.environ.get('CACHE_REDIS_URL')
+app.config['CACHE_DEFAULT_TIMEOUT'] = 60
 app.config['UPLOAD_FOLDER'] = 'user_credentials'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['MAX_CONTENT_LENGTH'] = 64 * 1024  # OAuth client files are a few KB
+
+# Compiled templates are pickled to disk so worker restarts skip parse/compile;
+# outside debug mode Flask already leaves jinja_env.auto_reload off (no stat per render).
+# The files are unpickled, so the directory must be private to the app user: Jinja's
+# default is a per-uid 0700 temp directory whose ownership it verifies.
+# JINJA_CACHE_DIR overrides it.
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(os.environ.get('JINJA_CACHE_DIR'))
 
 # Apply reverse proxy wrapper
 app.wsgi_app = ReverseProxied(app.wsgi_app)
 
 # Initialize extensions
 db = SQLAlchemy(app)
+cache = Cache(app)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
@@ -62,6 +157,9 @@ GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')
 GOOGLE_CLIENT_SECRET = os.environ.get('GOOGLE_CLIENT_SECRET')
 GOOGLE_REDIRECT_URI = os.environ.get('GOOGLE_REDIRECT_URI', 'https://daily.ayhd.dev/gmail-callback')
 
+# Seconds before a stalled Google API call gives the scheduler thread back
+GOOGLE_API_TIMEOUT = int(os.environ.get('GOOGLE_API_TIMEOUT', 15))
+
 # Scopes for Google APIs
 SCOPES = [
     'https://www.googleapis.com/auth/userinfo.email',
@@ -75,6 +173,10 @@ GMAIL_SCOPES = [
     'https://www.googleapis.com/auth/gmail.compose'
 ]
 
+# Password hashing (argon2id, single lane: gunicorn workers already serve logins in parallel);
+# legacy Werkzeug hashes and outdated parameters are upgraded on login
+password_hasher = PasswordHasher(time_cost=2, memory_cost=64 * 1024, parallelism=1)
+
 # Database Models
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -91,24 +193,33 @@ class User(UserMixin, db.Model):
     
     # Relationships
     search_configs = db.relationship('SearchConfig', backref='user', lazy=True, cascade='all, delete-orphan')
-    job_results = db.relationship('JobResult', backref='user', lazy=True, cascade='all, delete-orphan')
+    # Job results grow without bound; query them explicitly (filtered/paginated) instead
+    job_results = db.relationship('JobResult', backref='user', lazy='raise', cascade='all, delete-orphan')
+
+# Binary JSONB on PostgreSQL: stored pre-parsed and queryable server-side
+JSON_DOCUMENT = db.JSON().with_variant(JSONB(), 'postgresql')
 
 class SearchConfig(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     name = db.Column(db.String(120), nullable=False)
-    keywords = db.Column(db.Text, nullable=False)  # JSON string of keywords
+    keywords = db.Column(JSON_DOCUMENT, nullable=False)  # List of keywords
     search_logic = db.Column(db.String(20), default='AND')  # AND, OR, CUSTOM
     custom_logic = db.Column(db.Text, default='')  # Custom search logic
     frequency = db.Column(db.String(20), default='daily')  # daily, hourly, 2hourly, 3hourly, weekdays, weekly, twice_weekly, custom
-    custom_frequency = db.Column(db.Text, default='{}')  # JSON string for custom frequency settings
+    custom_frequency = db.Column(JSON_DOCUMENT, default=dict)  # Custom frequency settings
     location_filter = db.Column(db.String(200), default='remote OR "United States"')
-    job_sites = db.Column(db.Text, default='[]')  # JSON string of job sites
+    job_sites = db.Column(JSON_DOCUMENT, default=list)  # List of job sites
     max_job_age = db.Column(db.Integer, default=24)  # Maximum job age in hours
     is_active = db.Column(db.Boolean, default=True)
     search_time = db.Column(db.String(10), default='09:00')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_run = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_searchconfig_active', 'is_active'),
+        db.Index('ix_searchconfig_user_active', 'user_id', 'is_active'),
+    )
 
 class JobResult(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -120,10 +231,75 @@ class JobResult(db.Model):
     job_site = db.Column(db.String(100))
     keyword = db.Column(db.String(100))
     found_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_jobresult_user_found', 'user_id', 'found_at'),
+        db.Index('ix_jobresult_user_keyword_found', 'user_id', 'keyword', 'found_at'),
+        # One row per link per user; also serves link lookups
+        db.Index('uq_jobresult_user_link', 'user_id', 'link', unique=True),
+    )
+
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',       # readers don't block on the writer
+    'PRAGMA synchronous=NORMAL',     # fsync at checkpoints, still safe under WAL
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456'     # read hot pages through a 256MB mapping
+)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+with app.app_context():
+    if db.engine.dialect.name == 'sqlite':
+        event.listen(db.engine, 'connect', _set_sqlite_pragmas)
 
 # Initialize scheduler
-scheduler = BackgroundScheduler()
-scheduler.start()
+# Jobs persist in the app database (sharing its engine) so they survive restarts;
+# one run per search config at a time and missed runs collapse into one
+with app.app_context():
+    jobstore = SQLAlchemyJobStore(engine=db.engine)
+
+scheduler = BackgroundScheduler(
+    jobstores={'default': jobstore, 'local': MemoryJobStore()},
+    executors={'default': ThreadPoolExecutor(max_workers=30)},
+    job_defaults={'max_instances': 1, 'coalesce': True, 'misfire_grace_time': 300}
+)
+
+# APScheduler doesn't coordinate schedulers sharing a job store, so only the process
+# holding this lock runs jobs (one per host; set RUN_SCHEDULER=0 to opt a host out)
+SCHEDULER_LOCK_FILE = os.environ.get('SCHEDULER_LOCK_FILE', os.path.join(app.instance_path, 'scheduler.lock'))
+# How often the running scheduler rescans the store for jobs added by other workers
+SCHEDULER_POLL_SECONDS = 30
+
+def _acquire_scheduler_lock():
+    """Return the open, exclusively locked lock file, or None if another process holds it"""
+    if os.environ.get('RUN_SCHEDULER', '1') != '1':
+        return None
+    os.makedirs(os.path.dirname(SCHEDULER_LOCK_FILE), exist_ok=True)
+    lock_file = open(SCHEDULER_LOCK_FILE, 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+def _poll_job_store():
+    """No-op tick: each run makes the scheduler re-read its job stores"""
+
+# Held open for the life of the process; the lock is released when it exits
+_scheduler_lock = _acquire_scheduler_lock()
+if _scheduler_lock:
+    scheduler.start()
+    scheduler.add_job(_poll_job_store, 'interval', seconds=SCHEDULER_POLL_SECONDS,
+                      id='poll_job_store', jobstore='local')
+    logger.info(f"Running scheduled jobs in process {os.getpid()}")
+else:
+    # Paused: add_job/remove_job from this worker's requests still write the shared store
+    scheduler.start(paused=True)
 
 # Default job sites
 DEFAULT_JOB_SITES = [
@@ -144,9 +320,88 @@ DEFAULT_JOB_SITES = [
     "bamboohr.com"
 ]
 
+# Matches any known job site within a URL
+_SITE_RE = re.compile(r'(' + '|'.join(re.escape(site) for site in DEFAULT_JOB_SITES) + r')')
+
+# Identity columns of recently loaded users, so authenticated requests can skip
+# the per-request User SELECT. Only columns nothing ever rewrites are cached: the
+# rest (credentials, notification email, password hash...) stay unloaded and are
+# fetched fresh by one SELECT on first access, so a write from another worker is
+# never served stale. Entries are also dropped whenever this process writes the user.
+USER_CACHED_COLUMNS = ('id', 'email', 'name', 'google_id', 'created_at')
+_user_cache = TTLCache(maxsize=1024, ttl=60)
+_user_cache_lock = threading.Lock()
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _evict_cached_user(mapper, connection, target):
+    with _user_cache_lock:
+        _user_cache.pop(target.id, None)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(User, int(user_id))
+    user_id = int(user_id)
+    with _user_cache_lock:
+        cached = _user_cache.get(user_id)
+    
+    if cached is None:
+        user = db.session.get(User, user_id)
+        if user is not None:
+            with _user_cache_lock:
+                _user_cache[user_id] = {key: getattr(user, key) for key in USER_CACHED_COLUMNS}
+        return user
+    
+    # Rebuild a persistent instance from the cached columns without querying;
+    # the columns left out are expired and load on first access
+    user = User(**cached)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+def verify_password(user, password):
+    """Check a user's password, rehashing legacy or outdated hashes in place"""
+    if not user.password_hash:
+        return False
+    
+    if not user.password_hash.startswith('$argon2'):
+        # Hash from Werkzeug's generate_password_hash
+        if not check_password_hash(user.password_hash, password):
+            return False
+        user.password_hash = password_hasher.hash(password)
+        return True
+    
+    try:
+        password_hasher.verify(user.password_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False
+    
+    if password_hasher.check_needs_rehash(user.password_hash):
+        user.password_hash = password_hasher.hash(password)
+    return True
+
+@app.teardown_appcontext
+def commit_refreshed_credentials(exc):
+    """Persist refreshed OAuth tokens that no later commit picked up"""
+    if exc is None and g.pop('credentials_refreshed', False):
+        try:
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error saving refreshed credentials: {e}")
+            db.session.rollback()
+
+@lru_cache(maxsize=1024)
+def _parse_json_text(text):
+    """Parse credential JSON once per distinct text, shared across requests (treat as read-only)"""
+    return orjson.loads(text)
+
+def _user_json(user, field):
+    """Parse a JSON text column on user; unchanged values reuse the previous parse"""
+    return _parse_json_text(getattr(user, field))
+
+def oauth_state_matches(expected, received):
+    """Constant-time comparison of the stored and returned OAuth state tokens"""
+    if not expected or not received:
+        return False
+    return hmac.compare_digest(str(expected).encode(), str(received).encode())
 
 def get_google_flow():
     """Create Google OAuth flow"""
@@ -174,36 +429,67 @@ def get_google_credentials(user):
         return None
     
     try:
-        creds_data = json.loads(user.google_credentials)
+        creds_data = _user_json(user, 'google_credentials')
         creds = Credentials.from_authorized_user_info(creds_data, SCOPES)
         
         # Refresh if needed
         if creds.expired and creds.refresh_token:
             creds.refresh(google.auth.transport.requests.Request())
-            # Save refreshed credentials
+            # Save refreshed credentials with the next commit (or at teardown)
             user.google_credentials = creds.to_json()
-            db.session.commit()
+            g.credentials_refreshed = True
         
         return creds
     except Exception as e:
         logger.error(f"Error getting credentials for user {user.id}: {e}")
         return None
 
+# user id -> (uploaded credentials text, Flow); the text check rebuilds after a re-upload
+_gmail_flows = TTLCache(maxsize=256, ttl=600)
+_gmail_flows_lock = threading.Lock()
+
 def get_gmail_flow(user=None):
+    """Return the user's Gmail OAuth flow, reusing it between /gmail-auth and /gmail-callback
+
+    Only an optimisation: the callback gets its PKCE verifier from the session,
+    so any worker's (or a freshly built) flow can complete the exchange.
+    """
+    if user is None:
+        return _build_gmail_flow(user)
+    with _gmail_flows_lock:
+        cached = _gmail_flows.get(user.id)
+    if cached and cached[0] == user.user_oauth_credentials:
+        return cached[1]
+    
+    flow = _build_gmail_flow(user)
+    if flow:
+        with _gmail_flows_lock:
+            _gmail_flows[user.id] = (user.user_oauth_credentials, flow)
+    return flow
+
+def _drop_gmail_flow(user_id):
+    with _gmail_flows_lock:
+        _gmail_flows.pop(user_id, None)
+
+def _build_gmail_flow(user=None):
     """Create Gmail OAuth flow using user's credentials"""
     if user and user.user_oauth_credentials:
         try:
             # Use user's uploaded OAuth credentials
-            client_config = json.loads(user.user_oauth_credentials)
+            # Copy the cached parse so the overrides below don't leak into it
+            client_config = dict(_user_json(user, 'user_oauth_credentials'))
             # Use HTTPS redirect URI for production
             redirect_uri = 'https://daily.ayhd.dev/gmail-callback'
             
             # Force HTTPS redirect URIs in the client config
             if 'web' in client_config:
-                client_config['web']['redirect_uris'] = [redirect_uri]
-                # Ensure all URIs use HTTPS
-                client_config['web']['auth_uri'] = 'https://accounts.google.com/o/oauth2/auth'
-                client_config['web']['token_uri'] = 'https://oauth2.googleapis.com/token'
+                client_config['web'] = dict(
+                    client_config['web'],
+                    redirect_uris=[redirect_uri],
+                    # Ensure all URIs use HTTPS
+                    auth_uri='https://accounts.google.com/o/oauth2/auth',
+                    token_uri='https://oauth2.googleapis.com/token'
+                )
             
             logger.info(f"Creating OAuth flow with redirect_uri: {redirect_uri}")
             logger.info(f"Client config: {client_config}")
@@ -212,7 +498,8 @@ def get_gmail_flow(user=None):
             flow = Flow.from_client_config(
                 client_config,
                 scopes=GMAIL_SCOPES,
-                redirect_uri=redirect_uri
+                redirect_uri=redirect_uri,
+                autogenerate_code_verifier=True  # PKCE; the verifier travels in the session
             )
             
             # Force HTTPS in the flow
@@ -239,33 +526,111 @@ def get_gmail_flow(user=None):
                 }
             },
             scopes=GMAIL_SCOPES,
-            redirect_uri=redirect_uri
+            redirect_uri=redirect_uri,
+            autogenerate_code_verifier=True
         )
         return flow
     
     return None
 
+# Latest (refresh_token, access token, expiry) per user id, plus a lock per user so
+# concurrent requests wait for one token refresh instead of each refreshing.
+# Callers get their own Credentials built from it: refreshes mutate the
+# instance in place, so one is never shared between threads.
+_gmail_creds = {}
+_gmail_refresh_locks = {}
+
+def _cached_gmail_credentials(user, creds_data):
+    cached = _gmail_creds.get(user.id)
+    # A matching refresh token means the stored row is this grant (possibly pre-refresh)
+    if not cached or cached[0] != creds_data.get('refresh_token'):
+        return None
+    creds = Credentials.from_authorized_user_info(creds_data, GMAIL_SCOPES)
+    creds.token, creds.expiry = cached[1], cached[2]
+    return None if creds.expired else creds
+
 def get_gmail_credentials(user):
     """Get Gmail credentials for user"""
     if not user.gmail_credentials:
         return None
     
     try:
-        creds_data = json.loads(user.gmail_credentials)
-        creds = Credentials.from_authorized_user_info(creds_data, GMAIL_SCOPES)
-        
-        # Refresh if needed
-        if creds.expired and creds.refresh_token:
-            creds.refresh(google.auth.transport.requests.Request())
-            # Save refreshed credentials
-            user.gmail_credentials = creds.to_json()
-            db.session.commit()
+        creds_data = _user_json(user, 'gmail_credentials')
+        creds = _cached_gmail_credentials(user, creds_data)
+        if creds:
+            return creds
         
-        return creds
+        with _gmail_refresh_locks.setdefault(user.id, threading.Lock()):
+            # Another request may have refreshed while this one waited
+            creds = _cached_gmail_credentials(user, creds_data)
+            if creds:
+                return creds
+            
+            creds = Credentials.from_authorized_user_info(creds_data, GMAIL_SCOPES)
+            
+            # Refresh if needed
+            if creds.expired and creds.refresh_token:
+                creds.refresh(google.auth.transport.requests.Request())
+                # Save refreshed credentials with the next commit (or at teardown)
+                user.gmail_credentials = creds.to_json()
+                g.credentials_refreshed = True
+            
+            _gmail_creds[user.id] = (creds.refresh_token, creds.token, creds.expiry)
+            return creds
     except Exception as e:
         logger.error(f"Error getting Gmail credentials for user {user.id}: {e}")
         return None
 
+# httplib2.Http and discovery services aren't thread-safe, so each scheduler/request
+# thread keeps its own services (and keep-alive connections) per API key
+_cse_local = threading.local()
+
+def _cse_service(api_key):
+    """Build (and memoize for this thread) a Custom Search service for an API key"""
+    services = getattr(_cse_local, 'services', None)
+    if services is None:
+        services = _cse_local.services = LRUCache(maxsize=16)
+    service = services.get(api_key)
+    if service is None:
+        service = services[api_key] = build("customsearch", "v1", developerKey=api_key,
+                                            http=httplib2.Http(timeout=GOOGLE_API_TIMEOUT),
+                                            cache_discovery=False, static_discovery=True)
+    return service
+
+GMAIL_SEND_URL = 'https://gmail.googleapis.com/gmail/v1/users/me/messages/send'
+USERINFO_URL = 'https://www.googleapis.com/oauth2/v2/userinfo'
+
+# Process-wide keep-alive session for the sign-in userinfo lookup
+_userinfo_http = requests.Session()
+
+def fetch_google_user_info(credentials):
+    """Fetch the signed-in Google profile without building an oauth2 discovery client"""
+    response = _userinfo_http.get(
+        USERINFO_URL,
+        headers={'Authorization': f'Bearer {credentials.token}'},
+        timeout=GOOGLE_API_TIMEOUT
+    )
+    response.raise_for_status()
+    return response.json()
+
+# Process-wide keep-alive session for Gmail sends; every request carries the
+# calling thread's own access token, so no credentials are shared on the session
+_gmail_http = requests.Session()
+
+def _post_gmail(creds, url, payload):
+    """POST to the Gmail API with creds, refreshing the caller's copy once on a 401"""
+    for attempt in range(2):
+        headers = {}
+        creds.apply(headers)
+        response = _gmail_http.post(url, json=payload, headers=headers, timeout=GOOGLE_API_TIMEOUT)
+        if response.status_code != 401 or attempt or not creds.refresh_token:
+            return response
+        creds.refresh(google.auth.transport.requests.Request(session=_gmail_http))
+
+def _drop_gmail_credentials(user_id):
+    """Forget a user's cached Gmail token once their credentials are cleared"""
+    _gmail_creds.pop(user_id, None)
+
 def search_jobs_google_api(user, search_config):
     """Search for jobs using Google Custom Search API"""
     try:
@@ -274,7 +639,7 @@ def search_jobs_google_api(user, search_config):
             logger.info(f"No Google credentials for user {user.id}, returning empty results")
             return []
         
-        creds_data = json.loads(user.google_credentials)
+        creds_data = _user_json(user, 'google_credentials')
         api_key = creds_data.get('custom_search_api_key')
         search_engine_id = creds_data.get('search_engine_id')
         
@@ -283,15 +648,15 @@ def search_jobs_google_api(user, search_config):
             return []
         
         # Build search query
-        keywords = json.loads(search_config.keywords)
-        job_sites = json.loads(search_config.job_sites) if search_config.job_sites else DEFAULT_JOB_SITES
+        keywords = search_config.keywords
+        job_sites = search_config.job_sites or DEFAULT_JOB_SITES
         
         sites_query = " OR ".join([f"site:{site}" for site in job_sites])
         
         # Build keyword query based on search logic
-        search_logic = getattr(search_config, 'search_logic', 'AND')
+        search_logic = search_config.search_logic or 'AND'
         if search_logic == 'CUSTOM':
-            custom_logic = getattr(search_config, 'custom_logic', '')
+            custom_logic = search_config.custom_logic or ''
             keyword_query = custom_logic if custom_logic else ' OR '.join(keywords)
         elif search_logic == 'OR':
             keyword_query = ' OR '.join(keywords)
@@ -304,10 +669,12 @@ def search_jobs_google_api(user, search_config):
         logger.info(f"Search logic: {search_logic}, Keywords: {keywords}, Keyword query: {keyword_query}")
         
         # Use Google Custom Search API with API key
-        service = build("customsearch", "v1", developerKey=api_key)
+        service = _cse_service(api_key)
         
         # Determine date restriction based on max_job_age
-        max_job_age = getattr(search_config, 'max_job_age', 24)
+        max_job_age = search_config.max_job_age
+        if max_job_age is None:
+            max_job_age = 24  # 0 means no limit, so only default when unset
         date_restrict = None
         
         if max_job_age > 0:
@@ -331,7 +698,7 @@ def search_jobs_google_api(user, search_config):
         if date_restrict:
             search_params['dateRestrict'] = date_restrict
         
-        results = service.cse().list(**search_params).execute()
+        results = service.cse().list(**search_params).execute(num_retries=2)
         
         jobs = []
         for item in results.get('items', []):
@@ -351,12 +718,49 @@ def search_jobs_google_api(user, search_config):
         # Return empty results instead of sample data
         return []
 
+# Sample job templates as (title, job site, snippet), formatted with a keyword
+SAMPLE_OR_TEMPLATES = [
+    ('Senior {keyword} Manager', 'greenhouse.io',
+     'We are looking for a Senior {keyword} Manager to join our remote team. Experience with {keyword} required.'),
+    ('{keyword} Developer', 'smartrecruiters.com',
+     'We need a {keyword} Developer to join our growing team. Remote-first company with great benefits.'),
+    ('{keyword} Engineer', 'jobvite.com',
+     'Looking for a {keyword} Engineer with strong technical skills. Remote work available.'),
+    ('{keyword} Analyst', 'lever.co',
+     'Join our team as a {keyword} Analyst. Remote work available. Strong analytical skills required.')
+]
+
+SAMPLE_AND_TEMPLATES = [
+    ('Senior {keyword} Manager', 'greenhouse.io',
+     'We are looking for a Senior {keyword} Manager to join our remote team. Experience with {keyword} required.'),
+    ('{keyword} Analyst', 'lever.co',
+     'Join our team as a {keyword} Analyst. Remote work available. Strong analytical skills required.'),
+    ('Lead {keyword} Specialist', 'workday.com',
+     'Lead {keyword} Specialist position. Remote work. 5+ years experience in {keyword} field.'),
+    ('{keyword} Developer', 'smartrecruiters.com',
+     'We need a {keyword} Developer to join our growing team. Remote-first company with great benefits.'),
+    ('{keyword} Consultant', 'icims.com',
+     'Independent {keyword} Consultant needed for exciting projects. Flexible schedule and remote work.'),
+    ('{keyword} Engineer', 'jobvite.com',
+     'Looking for a {keyword} Engineer with strong technical skills. Remote work available.'),
+    ('{keyword} Coordinator', 'bamboohr.com',
+     '{keyword} Coordinator position available. Great opportunity for career growth in {keyword} field.')
+]
+
+SAMPLE_TITLE_SUFFIXES = ('', ' - Remote', ' - Full Time', ' - Contract', ' - Part Time')
+
+# Number of AND-logic sample results by keyword popularity
+SAMPLE_KEYWORD_COUNTS = {
+    'python': 6, 'developer': 5, 'engineer': 5, 'analyst': 4, 'manager': 4,
+    'business': 3, 'data': 4, 'software': 5, 'web': 4, 'full': 3
+}
+
 def get_sample_jobs(search_config):
     """Return sample job data for demonstration"""
     logger.info(f"Generating sample jobs for search config: {search_config.keywords}")
-    keywords = json.loads(search_config.keywords)
-    search_logic = getattr(search_config, 'search_logic', 'AND')
-    max_job_age = getattr(search_config, 'max_job_age', 24)
+    keywords = search_config.keywords
+    search_logic = search_config.search_logic or 'AND'
+    max_job_age = search_config.max_job_age
     if max_job_age is None:
         max_job_age = 24  # Default to 24 hours if None
     
@@ -370,117 +774,35 @@ def get_sample_jobs(search_config):
     
     logger.info(f"Using keywords: {sample_keywords}, search logic: {search_logic}, max job age: {max_job_age} hours")
     
-    # Create more realistic and varied sample data
-    import random
-    from datetime import timedelta
-    
-    # Generate job templates based on search logic
-    job_templates = []
-    
+    # Pair each (title, job site, snippet) template with the keyword it will be
+    # formatted with; only the randomly selected rows get formatted below
     if search_logic == 'OR':
         # For OR logic, create jobs with different keywords
-        for i, keyword in enumerate(sample_keywords):
-            job_templates.extend([
-                {
-                    'title_template': f'Senior {keyword} Manager',
-                    'company': f'TechCorp {i+1} Inc.',
-                    'job_site': 'greenhouse.io',
-                    'snippet_template': f'We are looking for a Senior {keyword} Manager to join our remote team. Experience with {keyword} required.'
-                },
-                {
-                    'title_template': f'{keyword} Developer',
-                    'company': f'CodeCraft {i+1} Solutions',
-                    'job_site': 'smartrecruiters.com',
-                    'snippet_template': f'We need a {keyword} Developer to join our growing team. Remote-first company with great benefits.'
-                },
-                {
-                    'title_template': f'{keyword} Engineer',
-                    'company': f'BuildTech {i+1}',
-                    'job_site': 'jobvite.com',
-                    'snippet_template': f'Looking for a {keyword} Engineer with strong technical skills. Remote work available.'
-                },
-                {
-                    'title_template': f'{keyword} Analyst',
-                    'company': f'DataFlow {i+1} Systems',
-                    'job_site': 'lever.co',
-                    'snippet_template': f'Join our team as a {keyword} Analyst. Remote work available. Strong analytical skills required.'
-                }
-            ])
-    else:
-        # For AND logic, use the first keyword
-        keyword = sample_keywords[0]
-        job_templates = [
-            {
-                'title_template': f'Senior {keyword} Manager',
-                'company': 'TechCorp Inc.',
-                'job_site': 'greenhouse.io',
-                'snippet_template': f'We are looking for a Senior {keyword} Manager to join our remote team. Experience with {keyword} required.'
-            },
-            {
-                'title_template': f'{keyword} Analyst',
-                'company': 'DataFlow Systems',
-                'job_site': 'lever.co',
-                'snippet_template': f'Join our team as a {keyword} Analyst. Remote work available. Strong analytical skills required.'
-            },
-            {
-                'title_template': f'Lead {keyword} Specialist',
-                'company': 'InnovateLabs',
-                'job_site': 'workday.com',
-                'snippet_template': f'Lead {keyword} Specialist position. Remote work. 5+ years experience in {keyword} field.'
-            },
-            {
-                'title_template': f'{keyword} Developer',
-                'company': 'CodeCraft Solutions',
-                'job_site': 'smartrecruiters.com',
-                'snippet_template': f'We need a {keyword} Developer to join our growing team. Remote-first company with great benefits.'
-            },
-            {
-                'title_template': f'{keyword} Consultant',
-                'company': 'Strategic Partners',
-                'job_site': 'icims.com',
-                'snippet_template': f'Independent {keyword} Consultant needed for exciting projects. Flexible schedule and remote work.'
-            },
-            {
-                'title_template': f'{keyword} Engineer',
-                'company': 'BuildTech',
-                'job_site': 'jobvite.com',
-                'snippet_template': f'Looking for a {keyword} Engineer with strong technical skills. Remote work available.'
-            },
-            {
-                'title_template': f'{keyword} Coordinator',
-                'company': 'ProjectFlow',
-                'job_site': 'bamboohr.com',
-                'snippet_template': f'{keyword} Coordinator position available. Great opportunity for career growth in {keyword} field.'
-            }
-        ]
-    
-    # Vary the number of results based on search logic and keyword popularity
-    if search_logic == 'OR':
+        candidates = [(template, sample_keyword)
+                      for sample_keyword in sample_keywords
+                      for template in SAMPLE_OR_TEMPLATES]
+        keyword = sample_keywords[-1]
         # For OR logic, return more results since we're matching any keyword
-        num_results = min(len(job_templates), 8)  # More results for OR logic
+        num_results = min(len(candidates), 8)  # More results for OR logic
     else:
-        # For AND logic, use keyword popularity
-        keyword_variations = {
-            'python': 6, 'developer': 5, 'engineer': 5, 'analyst': 4, 'manager': 4,
-            'business': 3, 'data': 4, 'software': 5, 'web': 4, 'full': 3
-        }
+        # For AND logic, use the first keyword
+        candidates = [(template, sample_keywords[0]) for template in SAMPLE_AND_TEMPLATES]
         
-        # Determine number of results based on keyword
+        # Determine number of results based on keyword popularity
         num_results = 3  # default
         keyword = sample_keywords[0].lower()
-        for key, count in keyword_variations.items():
-            if key.lower() in keyword:
+        for key, count in SAMPLE_KEYWORD_COUNTS.items():
+            if key in keyword:
                 num_results = count
                 break
     
     # Randomly select jobs from templates
-    selected_jobs = random.sample(job_templates, min(num_results, len(job_templates)))
+    selected_jobs = random.sample(candidates, min(num_results, len(candidates)))
     
     sample_jobs = []
-    for i, template in enumerate(selected_jobs):
+    for i, ((title_template, job_site, snippet_template), template_keyword) in enumerate(selected_jobs):
         # Add some variation to titles
-        title_variations = ['', ' - Remote', ' - Full Time', ' - Contract', ' - Part Time']
-        title_suffix = random.choice(title_variations)
+        title_suffix = random.choice(SAMPLE_TITLE_SUFFIXES)
         
         # Generate job age within the specified limit
         if max_job_age > 0:
@@ -493,10 +815,10 @@ def get_sample_jobs(search_config):
             job_found_at = datetime.now() - timedelta(hours=job_age_hours)
         
         sample_jobs.append({
-            'title': f"{template['title_template']}{title_suffix}",
+            'title': title_template.format(keyword=template_keyword) + title_suffix,
             'link': f'https://example.com/job{i+1}',
-            'snippet': template['snippet_template'],
-            'job_site': template['job_site'],
+            'snippet': snippet_template.format(keyword=template_keyword),
+            'job_site': job_site,
             'keyword': keyword,
             'found_at': job_found_at
         })
@@ -506,10 +828,8 @@ def get_sample_jobs(search_config):
 
 def extract_job_site(url):
     """Extract job site from URL"""
-    for site in DEFAULT_JOB_SITES:
-        if site in url:
-            return site
-    return "Unknown"
+    match = _SITE_RE.search(url)
+    return match.group(1) if match else "Unknown"
 
 def send_email_gmail_api(user, subject, content):
     """Send email using Gmail API"""
@@ -528,11 +848,6 @@ def send_email_gmail_api(user, subject, content):
         recipient_email = user.notification_email or user.email
         logger.info(f"User {user.id}: Sending to {recipient_email}")
         
-        # Build Gmail service
-        logger.info(f"User {user.id}: Building Gmail service")
-        service = build('gmail', 'v1', credentials=creds)
-        logger.info(f"User {user.id}: Gmail service built successfully")
-        
         # Create message
         logger.info(f"User {user.id}: Creating email message")
         message = create_message(user.email, recipient_email, subject, content)
@@ -540,35 +855,46 @@ def send_email_gmail_api(user, subject, content):
         
         # Send message
         logger.info(f"User {user.id}: Sending email via Gmail API")
-        result = service.users().messages().send(
-            userId='me',
-            body={'raw': message}
-        ).execute()
+        response = _post_gmail(creds, GMAIL_SEND_URL, {'raw': message})
+        response.raise_for_status()
+        result = response.json()
         
         logger.info(f"User {user.id}: Email sent successfully to {recipient_email}: {result.get('id')}")
         return True
         
     except Exception as e:
         logger.error(f"User {user.id}: Error sending email: {e}")
-        import traceback
         logger.error(f"User {user.id}: Traceback: {traceback.format_exc()}")
         return False
 
+def _encode_header(value):
+    """RFC 2047-encode a header value only when it isn't plain ASCII"""
+    # Never let user-controlled text (e.g. config names) start a new header
+    value = ' '.join(value.splitlines())
+    return value if value.isascii() else Header(value, 'utf-8').encode(linesep='\r\n')
+
 def create_message(sender, to, subject, content):
     """Create email message for Gmail API"""
-    import base64
-    from email.mime.text import MIMEText
-    from email.mime.multipart import MIMEMultipart
-    
-    msg = MIMEMultipart('alternative')
-    msg['From'] = sender
-    msg['To'] = to
-    msg['Subject'] = subject
-    
-    html_content = MIMEText(content, 'html')
-    msg.attach(html_content)
+    # Single HTML part, so assemble the RFC 5322 message directly
+    # instead of going through the email.generator machinery
+    message = (
+        f"From: {_encode_header(sender)}\r\n"
+        f"To: {_encode_header(to)}\r\n"
+        f"Subject: {_encode_header(subject)}\r\n"
+        "MIME-Version: 1.0\r\n"
+        "Content-Type: text/html; charset=utf-8\r\n"
+        "Content-Transfer-Encoding: 8bit\r\n"
+        "\r\n"
+        f"{content}"
+    )
     
-    return base64.urlsafe_b64encode(msg.as_bytes()).decode()
+    return base64.urlsafe_b64encode(message.encode('utf-8')).decode()
+
+# Static footer appended to every results email
+EMAIL_FOOTER = """
+    <hr>
+    <p><small>This email was generated automatically by the Daily Job Search Bot.</small></p>
+    """
 
 def format_email_content(jobs, config_name):
     """Format job search results into HTML email"""
@@ -576,175 +902,125 @@ def format_email_content(jobs, config_name):
         return "No new jobs found today."
     
     # Group jobs by keyword
-    jobs_by_keyword = {}
+    jobs_by_keyword = defaultdict(list)
     for job in jobs:
-        keyword = job['keyword']
-        if keyword not in jobs_by_keyword:
-            jobs_by_keyword[keyword] = []
-        jobs_by_keyword[keyword].append(job)
+        jobs_by_keyword[job['keyword']].append(job)
     
     # Build email content
-    email_content = f"""
+    parts = [f"""
     <h2>Daily Job Search Results - {config_name}</h2>
     <p>Found {len(jobs)} new job postings today!</p>
-    """
+    """]
     
     for keyword, keyword_jobs in jobs_by_keyword.items():
-        email_content += f"""
+        parts.append(f"""
         <h3>Keyword: {keyword} ({len(keyword_jobs)} jobs)</h3>
         <ul>
-        """
+        """)
         
         for job in keyword_jobs:
-            email_content += f"""
+            parts.append(f"""
             <li>
                 <strong><a href="{job['link']}" target="_blank">{job['title']}</a></strong><br>
                 <em>Site: {job['job_site']}</em><br>
                 <small>{job['snippet'][:200]}{'...' if len(job['snippet']) > 200 else ''}</small>
             </li>
             <br>
-            """
+            """)
         
-        email_content += "</ul>"
+        parts.append("</ul>")
     
-    email_content += """
-    <hr>
-    <p><small>This email was generated automatically by the Daily Job Search Bot.</small></p>
-    """
+    parts.append(EMAIL_FOOTER)
     
-    return email_content
+    return "".join(parts)
+
+def _cron_trigger(**fields):
+    """Trigger factory for a cron schedule firing at the configured hour and minute"""
+    return lambda hour, minute: CronTrigger(hour=hour, minute=minute, **fields)
+
+def _every_n_hours_trigger(hours):
+    """Trigger factory for an interval schedule anchored at today's configured time"""
+    def build_trigger(hour, minute):
+        # IntervalTrigger keeps a past start_date aligned, so no manual roll-forward is needed
+        start_time = datetime.now().replace(hour=hour, minute=minute, second=0, microsecond=0)
+        return IntervalTrigger(hours=hours, start_date=start_time)
+    return build_trigger
+
+# Search frequency -> trigger factory taking (hour, minute)
+FREQUENCY_TRIGGERS = {
+    'daily': _cron_trigger(),  # Every day at the specified time
+    'hourly': lambda hour, minute: CronTrigger(minute=minute),  # Every hour at the specified minute
+    '2hourly': _every_n_hours_trigger(2),  # Every 2 hours starting from the specified time
+    '3hourly': _every_n_hours_trigger(3),  # Every 3 hours starting from the specified time
+    'weekdays': _cron_trigger(day_of_week='mon-fri'),  # Monday to Friday
+    'weekly': _cron_trigger(day_of_week='mon'),  # Once per week (Monday)
+    'twice_weekly': _cron_trigger(day_of_week='mon,thu')  # Monday and Thursday
+}
+
+# Day names accepted in custom frequencies -> APScheduler day_of_week names
+DAY_ABBREVIATIONS = {
+    'monday': 'mon', 'tuesday': 'tue', 'wednesday': 'wed',
+    'thursday': 'thu', 'friday': 'fri', 'saturday': 'sat', 'sunday': 'sun'
+}
+
+def _custom_trigger(config, hour, minute):
+    """Build a cron trigger from a config's custom frequency days"""
+    custom_frequency = config.custom_frequency or {}
+    if 'days' not in custom_frequency:
+        # Fallback to daily if custom frequency is invalid
+        return CronTrigger(hour=hour, minute=minute)
+    
+    day_of_week = ','.join([DAY_ABBREVIATIONS.get(day, day) for day in custom_frequency['days']])
+    return CronTrigger(day_of_week=day_of_week, hour=hour, minute=minute)
 
 def schedule_search_job(config):
     """Schedule a search job based on frequency settings"""
     hour, minute = map(int, config.search_time.split(':'))
-    frequency = getattr(config, 'frequency', 'daily')
-    
-    if frequency == 'daily':
-        # Every day at the specified time
-        scheduler.add_job(
-            run_user_search,
-            'cron',
-            hour=hour,
-            minute=minute,
-            args=[config.user_id, config.id],
-            id=f"search_{config.id}",
-            replace_existing=True
-        )
-    elif frequency == 'hourly':
-        # Every hour at the specified minute
-        scheduler.add_job(
-            run_user_search,
-            'cron',
-            minute=minute,
-            args=[config.user_id, config.id],
-            id=f"search_{config.id}",
-            replace_existing=True
-        )
-    elif frequency == '2hourly':
-        # Every 2 hours starting from the specified time
-        from datetime import datetime, timedelta
-        now = datetime.now()
-        start_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-        if start_time <= now:
-            start_time += timedelta(hours=2)
-        
-        scheduler.add_job(
-            run_user_search,
-            'interval',
-            hours=2,
-            start_date=start_time,
-            args=[config.user_id, config.id],
-            id=f"search_{config.id}",
-            replace_existing=True
-        )
-    elif frequency == '3hourly':
-        # Every 3 hours starting from the specified time
-        from datetime import datetime, timedelta
-        now = datetime.now()
-        start_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-        if start_time <= now:
-            start_time += timedelta(hours=3)
-        
-        scheduler.add_job(
-            run_user_search,
-            'interval',
-            hours=3,
-            start_date=start_time,
-            args=[config.user_id, config.id],
-            id=f"search_{config.id}",
-            replace_existing=True
-        )
-    elif frequency == 'weekdays':
-        # Monday to Friday
-        scheduler.add_job(
-            run_user_search,
-            'cron',
-            day_of_week='mon-fri',
-            hour=hour,
-            minute=minute,
-            args=[config.user_id, config.id],
-            id=f"search_{config.id}",
-            replace_existing=True
-        )
-    elif frequency == 'weekly':
-        # Once per week (Monday)
-        scheduler.add_job(
-            run_user_search,
-            'cron',
-            day_of_week='mon',
-            hour=hour,
-            minute=minute,
-            args=[config.user_id, config.id],
-            id=f"search_{config.id}",
-            replace_existing=True
-        )
-    elif frequency == 'twice_weekly':
-        # Monday and Thursday
-        scheduler.add_job(
-            run_user_search,
-            'cron',
-            day_of_week='mon,thu',
-            hour=hour,
-            minute=minute,
-            args=[config.user_id, config.id],
-            id=f"search_{config.id}",
-            replace_existing=True
+    frequency = config.frequency or 'daily'
+    
+    if frequency == 'custom':
+        trigger = _custom_trigger(config, hour, minute)
+    elif frequency in FREQUENCY_TRIGGERS:
+        trigger = FREQUENCY_TRIGGERS[frequency](hour, minute)
+    else:
+        logger.warning(f"Unknown frequency '{frequency}' for search config {config.id}, not scheduling")
+        return
+    
+    scheduler.add_job(
+        # Stored by name so jobs load under gunicorn (app) and python app.py (__main__) alike
+        'app:run_user_search',
+        trigger,
+        args=[config.user_id, config.id],
+        id=f"search_{config.id}",
+        replace_existing=True
+    )
+
+# Columns refreshed when an upserted job result's link already exists
+JOB_RESULT_UPSERT_COLUMNS = ['title', 'snippet', 'job_site', 'keyword', 'found_at']
+
+def insert_job_results(mappings, update_existing=False):
+    """Insert job result rows in one statement, skipping (or with update_existing,
+    refreshing) links the user already has"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        stmt = postgresql_insert(JobResult)
+    elif dialect == 'sqlite':
+        stmt = sqlite_insert(JobResult)
+    else:
+        db.session.execute(insert(JobResult).values(mappings))
+        return
+    
+    if update_existing:
+        # DO UPDATE may touch each row only once per statement, so keep the last copy of a link
+        mappings = list({(row['user_id'], row['link']): row for row in mappings}.values())
+        stmt = stmt.values(mappings)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'link'],
+            set_={column: stmt.excluded[column] for column in JOB_RESULT_UPSERT_COLUMNS}
         )
-    elif frequency == 'custom':
-        # Custom frequency
-        custom_frequency = json.loads(getattr(config, 'custom_frequency', '{}'))
-        if custom_frequency and 'days' in custom_frequency:
-            days = custom_frequency['days']
-            interval = custom_frequency.get('interval', 1)
-            
-            # Convert day names to APScheduler format
-            day_mapping = {
-                'monday': 'mon', 'tuesday': 'tue', 'wednesday': 'wed',
-                'thursday': 'thu', 'friday': 'fri', 'saturday': 'sat', 'sunday': 'sun'
-            }
-            day_of_week = ','.join([day_mapping.get(day, day) for day in days])
-            
-            scheduler.add_job(
-                run_user_search,
-                'cron',
-                day_of_week=day_of_week,
-                hour=hour,
-                minute=minute,
-                args=[config.user_id, config.id],
-                id=f"search_{config.id}",
-                replace_existing=True
-            )
-        else:
-            # Fallback to daily if custom frequency is invalid
-            scheduler.add_job(
-                run_user_search,
-                'cron',
-                hour=hour,
-                minute=minute,
-                args=[config.user_id, config.id],
-                id=f"search_{config.id}",
-                replace_existing=True
-            )
+    else:
+        stmt = stmt.values(mappings).on_conflict_do_nothing(index_elements=['user_id', 'link'])
+    db.session.execute(stmt)
 
 def run_user_search(user_id, search_config_id):
     """Run job search for a specific user and config"""
@@ -759,23 +1035,23 @@ def run_user_search(user_id, search_config_id):
         jobs = search_jobs_google_api(user, search_config)
         
         if jobs:
-            # Save job results
-            for job_data in jobs:
-                job_result = JobResult(
-                    user_id=user.id,
-                    search_config_id=search_config.id,
-                    title=job_data['title'],
-                    link=job_data['link'],
-                    snippet=job_data['snippet'],
-                    job_site=job_data['job_site'],
-                    keyword=job_data['keyword'],
-                    found_at=job_data['found_at']
-                )
-                db.session.add(job_result)
-            
+            # Save job results in a single bulk insert
+            mappings = [{
+                'user_id': user.id,
+                'search_config_id': search_config.id,
+                'title': job_data['title'],
+                'link': job_data['link'],
+                'snippet': job_data['snippet'],
+                'job_site': job_data['job_site'],
+                'keyword': job_data['keyword'],
+                'found_at': job_data['found_at']
+            } for job_data in jobs]
+            insert_job_results(mappings)
+
             # Update last run time
-            search_config.last_run = datetime.utcnow()
+            search_config.last_run = func.now()
             db.session.commit()
+            invalidate_dashboard(user.id)
             
             # Send email notification
             if user.google_credentials:
@@ -791,6 +1067,49 @@ def schedule_user_searches():
         # Schedule job based on frequency
         schedule_search_job(config)
 
+@cache.memoize()
+def get_dashboard_stats(user_id):
+    """Dashboard counts and recent jobs for a user, cached briefly per user"""
+    # Both counts and the 10 most recent jobs come back in a single statement:
+    # a one-row counts subquery LEFT JOINed to the recent rows
+    counts = select(
+        select(func.count()).select_from(JobResult)
+            .where(JobResult.user_id == user_id)
+            .scalar_subquery().label('total_jobs'),
+        select(func.count()).select_from(SearchConfig)
+            .where(SearchConfig.user_id == user_id, SearchConfig.is_active.is_(True))
+            .scalar_subquery().label('active_configs')
+    ).subquery()
+    recent = select(
+        JobResult.title, JobResult.link, JobResult.snippet,
+        JobResult.job_site, JobResult.keyword, JobResult.found_at
+    ).where(JobResult.user_id == user_id)\
+        .order_by(JobResult.found_at.desc()).limit(10).subquery()
+    
+    rows = db.session.execute(
+        select(counts, recent)
+        .select_from(counts.outerjoin(recent, true()))
+        .order_by(recent.c.found_at.desc())
+    ).all()
+    
+    return {
+        'total_jobs': rows[0].total_jobs,
+        'active_configs': rows[0].active_configs,
+        # Plain dicts so cached entries don't hold on to session-bound instances
+        'recent_jobs': [{
+            'title': row.title,
+            'link': row.link,
+            'snippet': row.snippet or '',
+            'job_site': row.job_site,
+            'keyword': row.keyword,
+            'found_at': row.found_at
+        } for row in rows if row.link is not None]
+    }
+
+def invalidate_dashboard(user_id):
+    """Drop cached dashboard data after a user's jobs or configs change"""
+    cache.delete_memoized(get_dashboard_stats, user_id)
+
 # Routes
 @app.route('/')
 def index():
@@ -809,7 +1128,7 @@ def register():
         password = request.form['password']
         
         # Check if user already exists
-        if User.query.filter_by(email=email).first():
+        if db.session.scalar(select(exists().where(User.email == email))):
             flash('Email already registered', 'error')
             return render_template('register.html')
         
@@ -817,7 +1136,7 @@ def register():
         user = User(
             email=email,
             name=name,
-            password_hash=generate_password_hash(password)
+            password_hash=password_hasher.hash(password)
         )
         db.session.add(user)
         db.session.commit()
@@ -839,9 +1158,9 @@ def login():
         
         user = User.query.filter_by(email=email).first()
         
-        if user and check_password_hash(user.password_hash, password):
+        if user and verify_password(user, password):
             login_user(user)
-            user.last_login = datetime.utcnow()
+            user.last_login = func.now()
             db.session.commit()
             flash('Login successful!', 'success')
             return redirect(url_for('dashboard'))
@@ -877,13 +1196,12 @@ def callback():
     
     flow.fetch_token(authorization_response=request.url)
     
-    if not session.get('state') == request.args.get('state'):
+    if not oauth_state_matches(session.get('state'), request.args.get('state')):
         flash('Invalid state parameter', 'error')
         return redirect(url_for('index'))
     
     credentials = flow.credentials
-    user_info_service = build('oauth2', 'v2', credentials=credentials)
-    user_info = user_info_service.userinfo().get().execute()
+    user_info = fetch_google_user_info(credentials)
     
     # Check if user exists
     user = User.query.filter_by(google_id=user_info['id']).first()
@@ -897,13 +1215,13 @@ def callback():
             google_credentials=credentials.to_json()
         )
         db.session.add(user)
-        db.session.commit()
     else:
         # Update existing user
         user.google_credentials = credentials.to_json()
-        user.last_login = datetime.utcnow()
-        db.session.commit()
+        user.last_login = func.now()
     
+    # Single commit for either branch; it also assigns a new user's id before login_user
+    db.session.commit()
     login_user(user)
     flash('Login successful!', 'success')
     return redirect(url_for('dashboard'))
@@ -921,13 +1239,18 @@ def gmail_auth():
         # Clear existing Gmail credentials to force fresh authorization
         current_user.gmail_credentials = None
         db.session.commit()
+        _drop_gmail_credentials(current_user.id)
         
         # Force HTTPS for the authorization URL
-        authorization_url, state = flow.authorization_url(
-            access_type='offline',
-            include_granted_scopes='true',
-            prompt='consent'  # Force consent screen to get fresh tokens
-        )
+        # (the flow may be cached and shared: read back the PKCE verifier it just
+        # generated before another request can replace it)
+        with _gmail_flows_lock:
+            authorization_url, state = flow.authorization_url(
+                access_type='offline',
+                include_granted_scopes='true',
+                prompt='consent'  # Force consent screen to get fresh tokens
+            )
+            code_verifier = flow.code_verifier
         
         # Ensure the authorization URL uses HTTPS
         if authorization_url.startswith('http://'):
@@ -937,6 +1260,8 @@ def gmail_auth():
         logger.info(f"State: {state}")
         
         session['gmail_state'] = state
+        # The callback may land on another worker or after the flow cache expired
+        session['gmail_code_verifier'] = code_verifier
         return redirect(authorization_url)
     except Exception as e:
         logger.error(f"Gmail OAuth error: {e}")
@@ -965,7 +1290,7 @@ def gmail_callback():
             return redirect(url_for('settings'))
         
         # Verify state parameter
-        if state != session.get('gmail_state'):
+        if not oauth_state_matches(session.get('gmail_state'), state):
             logger.error(f"State mismatch: received {state}, expected {session.get('gmail_state')}")
             flash('Gmail authorization failed. Invalid state parameter.', 'error')
             return redirect(url_for('settings'))
@@ -980,7 +1305,7 @@ def gmail_callback():
         
         # Exchange authorization code for tokens
         try:
-            flow.fetch_token(code=code)
+            flow.fetch_token(code=code, code_verifier=session.pop('gmail_code_verifier', None))
             credentials = flow.credentials
             logger.info("Successfully obtained credentials")
         except Exception as e:
@@ -999,7 +1324,6 @@ def gmail_callback():
         
     except Exception as e:
         logger.error(f"Gmail callback error: {e}")
-        import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
         flash('Gmail authorization failed. Please try again.', 'error')
         return redirect(url_for('settings'))
@@ -1007,6 +1331,8 @@ def gmail_callback():
 @app.route('/logout')
 @login_required
 def logout():
+    with _user_cache_lock:
+        _user_cache.pop(current_user.id, None)
     logout_user()
     return redirect(url_for('index'))
 
@@ -1014,15 +1340,12 @@ def logout():
 @login_required
 def dashboard():
     # Get user statistics
-    total_jobs = JobResult.query.filter_by(user_id=current_user.id).count()
-    active_configs = SearchConfig.query.filter_by(user_id=current_user.id, is_active=True).count()
-    recent_jobs = JobResult.query.filter_by(user_id=current_user.id)\
-        .order_by(JobResult.found_at.desc()).limit(10).all()
+    stats = get_dashboard_stats(current_user.id)
     
     return render_template('dashboard.html', 
-                         total_jobs=total_jobs,
-                         active_configs=active_configs,
-                         recent_jobs=recent_jobs)
+                         total_jobs=stats['total_jobs'],
+                         active_configs=stats['active_configs'],
+                         recent_jobs=stats['recent_jobs'])
 
 @app.route('/settings')
 @login_required
@@ -1031,7 +1354,7 @@ def settings():
     api_keys = {}
     if current_user.google_credentials:
         try:
-            creds_data = json.loads(current_user.google_credentials)
+            creds_data = _user_json(current_user, 'google_credentials')
             api_keys = {
                 'custom_search_api_key': creds_data.get('custom_search_api_key', ''),
                 'search_engine_id': creds_data.get('search_engine_id', '')
@@ -1056,23 +1379,22 @@ def settings():
 @login_required
 def jobs():
     """Show all job results organized by search configuration"""
-    # Get all search configurations for the user
-    search_configs = SearchConfig.query.filter_by(user_id=current_user.id).all()
+    # The page only shows how many search configurations the user has
+    search_config_count = db.session.scalar(
+        select(func.count()).select_from(SearchConfig).where(SearchConfig.user_id == current_user.id)
+    )
     
-    # Get all job results for the user
-    job_results = JobResult.query.filter_by(user_id=current_user.id)\
-        .order_by(JobResult.found_at.desc()).all()
+    # Get all job results for the user, already sorted into keyword groups
+    # raiseload: the template only reads columns, so any per-row relationship load is a bug
+    job_results = JobResult.query.options(raiseload('*')).filter_by(user_id=current_user.id)\
+        .order_by(JobResult.keyword, JobResult.found_at.desc()).all()
     
-    # Group jobs by keyword for better organization
-    jobs_by_keyword = {}
-    for job in job_results:
-        keyword = job.keyword
-        if keyword not in jobs_by_keyword:
-            jobs_by_keyword[keyword] = []
-        jobs_by_keyword[keyword].append(job)
+    # Group jobs by keyword for better organization (one pass over the sorted rows)
+    jobs_by_keyword = {keyword: list(keyword_jobs)
+                       for keyword, keyword_jobs in groupby(job_results, key=lambda job: job.keyword)}
     
     return render_template('jobs.html', 
-                         search_configs=search_configs,
+                         search_config_count=search_config_count,
                          job_results=job_results,
                          jobs_by_keyword=jobs_by_keyword)
 
@@ -1083,7 +1405,7 @@ def save_api_keys():
     
     # Store API keys in user's google_credentials field for now
     # In production, you'd want a separate settings table
-    current_user.google_credentials = json.dumps({
+    current_user.google_credentials = _orjson_dumps({
         'custom_search_api_key': data.get('custom_search_api_key', ''),
         'search_engine_id': data.get('search_engine_id', ''),
         'gmail_configured': True
@@ -1104,6 +1426,27 @@ def save_email_settings():
     
     return jsonify({'success': True, 'message': 'Email settings saved successfully'})
 
+def is_oauth_client_file(stream):
+    """Check a JSON stream is an object with a top-level 'web' or 'installed' key
+
+    Streams parser events instead of building the document: anything that
+    isn't an object is rejected at the first token, and the rest of the file
+    is only tokenized to confirm it is well-formed.
+    """
+    found = False
+    for prefix, ijson_event, value in ijson.parse(stream):
+        if prefix:
+            continue
+        if ijson_event == 'map_key':
+            found = found or value in ('web', 'installed')
+        elif ijson_event not in ('start_map', 'end_map'):
+            return False
+    return found
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({'success': False, 'message': 'Uploaded file is too large'}), 413
+
 @app.route('/api/upload-credentials', methods=['POST'])
 @login_required
 def upload_credentials():
@@ -1117,21 +1460,19 @@ def upload_credentials():
     
     if file and file.filename.endswith('.json'):
         try:
-            # Read and validate the JSON file
-            content = file.read().decode('utf-8')
-            credentials_data = json.loads(content)
-            
-            # Validate that it's a proper OAuth credentials file
-            if 'web' not in credentials_data and 'installed' not in credentials_data:
+            # Validate the JSON file
+            if not is_oauth_client_file(file.stream):
                 return jsonify({'success': False, 'message': 'Invalid credentials file format'}), 400
             
             # Save to user's record
-            current_user.user_oauth_credentials = content
+            file.stream.seek(0)
+            current_user.user_oauth_credentials = file.read().decode('utf-8')
             db.session.commit()
+            _drop_gmail_flow(current_user.id)
             
             return jsonify({'success': True, 'message': 'Credentials uploaded successfully'})
             
-        except json.JSONDecodeError:
+        except (ijson.JSONError, UnicodeDecodeError):
             return jsonify({'success': False, 'message': 'Invalid JSON file'}), 400
         except Exception as e:
             logger.error(f"Error uploading credentials: {e}")
@@ -1148,6 +1489,8 @@ def delete_credentials():
         current_user.user_oauth_credentials = None
         current_user.gmail_credentials = None  # Also clear Gmail auth tokens
         db.session.commit()
+        _drop_gmail_credentials(current_user.id)
+        _drop_gmail_flow(current_user.id)
         
         return jsonify({'success': True, 'message': 'Credentials deleted successfully'})
         
@@ -1177,6 +1520,18 @@ def test_email():
         logger.info(f"User email: {current_user.email}")
         logger.info(f"User notification email: {current_user.notification_email}")
         
+        # Check the cheap prerequisites before anything that may refresh a token
+        if not current_user.gmail_credentials:
+            logger.error(f"User {current_user.id}: No Gmail credentials found")
+            return jsonify({'success': False, 'message': 'Gmail not configured. Please authorize Gmail first.'}), 400
+        
+        # Get user's search configurations
+        configs = SearchConfig.query.filter_by(user_id=current_user.id, is_active=True).all()
+        
+        if not configs:
+            logger.warning(f"User {current_user.id}: No active search configurations found")
+            return jsonify({'success': False, 'message': 'No active search configurations found. Please create a search configuration first.'}), 400
+        
         # Get Gmail credentials
         creds = get_gmail_credentials(current_user)
         if not creds:
@@ -1189,19 +1544,12 @@ def test_email():
         recipient_email = current_user.notification_email or current_user.email
         logger.info(f"User {current_user.id}: Sending test email to {recipient_email}")
         
-        # Get user's search configurations
-        configs = SearchConfig.query.filter_by(user_id=current_user.id, is_active=True).all()
-        
-        if not configs:
-            logger.warning(f"User {current_user.id}: No active search configurations found")
-            return jsonify({'success': False, 'message': 'No active search configurations found. Please create a search configuration first.'}), 400
-        
         # Get the first active configuration for testing
         config = configs[0]
         logger.info(f"User {current_user.id}: Using search config: {config.name}")
         
         # Parse keywords
-        keywords = json.loads(config.keywords) if config.keywords else []
+        keywords = config.keywords or []
         
         # Create test email content with jobs found
         subject = f"Daily Job Search - Test Email - {config.name}"
@@ -1215,7 +1563,7 @@ def test_email():
         <p><strong>Search Name:</strong> {config.name}</p>
         <p><strong>Keywords:</strong> {', '.join(keywords)}</p>
         <p><strong>Location Filter:</strong> {config.location_filter}</p>
-        <p><strong>Job Sites:</strong> {', '.join(json.loads(config.job_sites) if config.job_sites else DEFAULT_JOB_SITES)}</p>
+        <p><strong>Job Sites:</strong> {', '.join(config.job_sites or DEFAULT_JOB_SITES)}</p>
         <p><strong>Max Job Age:</strong> {config.max_job_age} hours</p>
         <hr>
         <h3>Recent Jobs Found</h3>
@@ -1270,17 +1618,27 @@ def test_email():
 @login_required
 def search_configs():
     if request.method == 'GET':
-        configs = SearchConfig.query.filter_by(user_id=current_user.id).all()
+        # Plain column rows: no ORM instances to hydrate or track for a read-only listing
+        configs = db.session.execute(
+            select(
+                SearchConfig.id, SearchConfig.name, SearchConfig.keywords,
+                SearchConfig.search_logic, SearchConfig.custom_logic,
+                SearchConfig.frequency, SearchConfig.custom_frequency,
+                SearchConfig.location_filter, SearchConfig.job_sites,
+                SearchConfig.max_job_age, SearchConfig.is_active,
+                SearchConfig.search_time, SearchConfig.last_run
+            ).where(SearchConfig.user_id == current_user.id)
+        ).all()
         return jsonify([{
             'id': config.id,
             'name': config.name,
-            'keywords': json.loads(config.keywords),
-            'search_logic': getattr(config, 'search_logic', 'AND'),
-            'custom_logic': getattr(config, 'custom_logic', ''),
-            'frequency': getattr(config, 'frequency', 'daily'),
-            'custom_frequency': json.loads(getattr(config, 'custom_frequency', '{}')),
+            'keywords': config.keywords,
+            'search_logic': config.search_logic or 'AND',
+            'custom_logic': config.custom_logic or '',
+            'frequency': config.frequency or 'daily',
+            'custom_frequency': config.custom_frequency or {},
             'location_filter': config.location_filter,
-            'job_sites': json.loads(config.job_sites) if config.job_sites else DEFAULT_JOB_SITES,
+            'job_sites': config.job_sites or DEFAULT_JOB_SITES,
             'max_job_age': config.max_job_age,
             'is_active': config.is_active,
             'search_time': config.search_time,
@@ -1293,13 +1651,13 @@ def search_configs():
         config = SearchConfig(
             user_id=current_user.id,
             name=data['name'],
-            keywords=json.dumps(data['keywords']),
+            keywords=data['keywords'],
             search_logic=data.get('search_logic', 'AND'),
             custom_logic=data.get('custom_logic', ''),
             frequency=data.get('frequency', 'daily'),
-            custom_frequency=json.dumps(data.get('custom_frequency', {})),
+            custom_frequency=data.get('custom_frequency', {}),
             location_filter=data.get('location_filter', 'remote OR "United States"'),
-            job_sites=json.dumps(data.get('job_sites', DEFAULT_JOB_SITES)),
+            job_sites=data.get('job_sites', DEFAULT_JOB_SITES),
             max_job_age=data.get('max_job_age', 24),
             is_active=data.get('is_active', True),
             search_time=data.get('search_time', '09:00')
@@ -1307,6 +1665,7 @@ def search_configs():
         
         db.session.add(config)
         db.session.commit()
+        invalidate_dashboard(current_user.id)
         
         # Schedule the new search
         if config.is_active:
@@ -1330,18 +1689,19 @@ def search_config(config_id):
                 return jsonify({'success': False, 'message': 'No data provided'}), 400
             
             config.name = data['name']
-            config.keywords = json.dumps(data['keywords'])
+            config.keywords = data['keywords']
             config.search_logic = data.get('search_logic', 'AND')
             config.custom_logic = data.get('custom_logic', '')
             config.frequency = data.get('frequency', 'daily')
-            config.custom_frequency = json.dumps(data.get('custom_frequency', {}))
+            config.custom_frequency = data.get('custom_frequency', {})
             config.location_filter = data.get('location_filter', 'remote OR "United States"')
-            config.job_sites = json.dumps(data.get('job_sites', DEFAULT_JOB_SITES))
+            config.job_sites = data.get('job_sites', DEFAULT_JOB_SITES)
             config.max_job_age = data.get('max_job_age', 24)
             config.is_active = data.get('is_active', True)
             config.search_time = data.get('search_time', '09:00')
             
             db.session.commit()
+            invalidate_dashboard(current_user.id)
         except Exception as e:
             logger.error(f"Error updating configuration {config_id}: {e}")
             return jsonify({'success': False, 'message': f'Error updating configuration: {str(e)}'}), 400
@@ -1365,6 +1725,7 @@ def search_config(config_id):
         
         db.session.delete(config)
         db.session.commit()
+        invalidate_dashboard(current_user.id)
         
         return jsonify({'success': True, 'message': 'Configuration deleted successfully'})
 
@@ -1376,11 +1737,11 @@ def test_search():
     
     # Create temporary search config
     temp_config = SearchConfig(
-        keywords=json.dumps(data['keywords']),
+        keywords=data['keywords'],
         search_logic=data.get('search_logic', 'AND'),
         custom_logic=data.get('custom_logic', ''),
         location_filter=data.get('location_filter', 'remote OR "United States"'),
-        job_sites=json.dumps(data.get('job_sites', DEFAULT_JOB_SITES)),
+        job_sites=data.get('job_sites', DEFAULT_JOB_SITES),
         max_job_age=data.get('max_job_age', 24)
     )
     
@@ -1401,30 +1762,36 @@ def test_search():
         logger.warning(f"Google API search failed: {e}")
         jobs = []  # Return empty list instead of sample data
     
-    # Clear old test results for this user to avoid accumulation
-    JobResult.query.filter_by(user_id=current_user.id).delete()
-    
-    # Save the test results to the database so they appear on the dashboard
-    for job in jobs:
-        job_result = JobResult(
-            user_id=current_user.id,
-            title=job['title'],
-            link=job['link'],
-            snippet=job['snippet'],
-            job_site=job['job_site'],
-            keyword=job['keyword'],
-            found_at=job['found_at']
-        )
-        db.session.add(job_result)
+    # Drop earlier test results this search didn't return, to avoid accumulation
+    stale_test_results = delete(JobResult).where(
+        JobResult.user_id == current_user.id,
+        JobResult.search_config_id.is_(None)
+    )
+    if jobs:
+        stale_test_results = stale_test_results.where(JobResult.link.not_in([job['link'] for job in jobs]))
+    db.session.execute(stale_test_results)
+    
+    # Save the test results to the database so they appear on the dashboard;
+    # links already stored are refreshed in place
+    if jobs:
+        insert_job_results([{
+            'user_id': current_user.id,
+            'title': job['title'],
+            'link': job['link'],
+            'snippet': job['snippet'],
+            'job_site': job['job_site'],
+            'keyword': job['keyword'],
+            'found_at': job['found_at']
+        } for job in jobs], update_existing=True)
     
     db.session.commit()
+    invalidate_dashboard(current_user.id)
     logger.info(f"Saved {len(jobs)} jobs to database")
     
     # Send email with the test results
     try:
-        # Get Gmail credentials
-        creds = get_gmail_credentials(current_user)
-        if creds:
+        # send_email_gmail_api loads (and if needed refreshes) the credentials itself
+        if current_user.gmail_credentials:
             logger.info(f"User {current_user.id}: Gmail credentials found, sending test email with results")
             
             # Get notification email
@@ -1488,6 +1855,7 @@ def delete_job(job_id):
     
     db.session.delete(job)
     db.session.commit()
+    invalidate_dashboard(current_user.id)
     
     return jsonify({'success': True, 'message': 'Job deleted successfully'})
 
@@ -1495,21 +1863,7 @@ def delete_job(job_id):
 def migrate_database():
     """Migrate database schema to add missing columns"""
     try:
-        # Check if user_oauth_credentials column exists
-        result = db.session.execute("PRAGMA table_info(user)")
-        columns = [row[1] for row in result.fetchall()]
-        
-        migrations_applied = []
-        
-        if 'user_oauth_credentials' not in columns:
-            db.session.execute("ALTER TABLE user ADD COLUMN user_oauth_credentials TEXT")
-            db.session.commit()
-            migrations_applied.append("Added user_oauth_credentials column")
-            
-        if 'notification_email' not in columns:
-            db.session.execute("ALTER TABLE user ADD COLUMN notification_email VARCHAR(120)")
-            db.session.commit()
-            migrations_applied.append("Added notification_email column")
+        migrations_applied = [f"Added {name} column" for name in add_missing_user_columns()]
         
         if migrations_applied:
             return jsonify({'success': True, 'message': f'Database migration completed: {", ".join(migrations_applied)}'})
@@ -1520,40 +1874,101 @@ def migrate_database():
         logger.error(f"Database migration error: {e}")
         return jsonify({'success': False, 'message': f'Migration failed: {str(e)}'}), 500
 
-# Initialize database and schedule jobs
+# Columns added to the user table after its first release, with their DDL types
+USER_COLUMN_MIGRATIONS = [
+    ('user_oauth_credentials', 'TEXT'),
+    ('notification_email', 'VARCHAR(120)')
+]
+
+def add_missing_user_columns():
+    """Add the USER_COLUMN_MIGRATIONS columns the user table lacks; returns their names
+
+    The column check and every ALTER share one transaction, so the batch
+    commits (and fsyncs) once and rolls back as a whole on failure.
+    """
+    with db.engine.begin() as conn:
+        columns = {column['name'] for column in inspect(conn).get_columns('user')}
+        missing_columns = [(name, ddl) for name, ddl in USER_COLUMN_MIGRATIONS if name not in columns]
+        
+        for name, ddl in missing_columns:
+            conn.exec_driver_sql(f'ALTER TABLE "user" ADD COLUMN {name} {ddl}')
+            logger.info(f"Added {name} column to user table")
+    
+    return [name for name, ddl in missing_columns]
+
+def schedule_user_searches_in_background():
+    """Schedule all active searches on a worker thread so startup isn't blocked"""
+    def run():
+        with app.app_context():
+            schedule_user_searches()
+    
+    threading.Thread(target=run, name='schedule-user-searches', daemon=True).start()
+
+# Create tables and upgrade databases that predate the current schema
 def create_tables():
     db.create_all()
     
     # Add missing columns if they don't exist (for existing databases)
     try:
-        # Check if user_oauth_credentials column exists
-        result = db.session.execute("PRAGMA table_info(user)")
-        columns = [row[1] for row in result.fetchall()]
-        
-        if 'user_oauth_credentials' not in columns:
-            db.session.execute("ALTER TABLE user ADD COLUMN user_oauth_credentials TEXT")
-            db.session.commit()
-            logger.info("Added user_oauth_credentials column to user table")
-            
-        if 'notification_email' not in columns:
-            db.session.execute("ALTER TABLE user ADD COLUMN notification_email VARCHAR(120)")
-            db.session.commit()
-            logger.info("Added notification_email column to user table")
-            
+        add_missing_user_columns()
     except Exception as e:
         logger.error(f"Error updating database schema: {e}")
         # Continue anyway, the columns might already exist
     
-    schedule_user_searches()
+    # Convert legacy TEXT/JSON columns to JSONB on PostgreSQL (SQLite reads the stored JSON text as-is)
+    try:
+        if db.engine.dialect.name == 'postgresql':
+            columns = {column['name']: column['type'] for column in inspect(db.engine).get_columns('search_config')}
+            for name in ('keywords', 'job_sites', 'custom_frequency'):
+                if not isinstance(columns.get(name), JSONB):
+                    db.session.execute(text(f"ALTER TABLE search_config ALTER COLUMN {name} TYPE JSONB USING {name}::jsonb"))
+                    logger.info(f"Converted search_config.{name} to JSONB")
+            db.session.commit()
+    except Exception as e:
+        logger.error(f"Error converting JSON columns: {e}")
+        db.session.rollback()
+    
+    # Create indexes missing from tables that predate them
+    try:
+        index_names = {index['name'] for index in inspect(db.engine).get_indexes('job_result')}
+        if 'uq_jobresult_user_link' not in index_names:
+            # Keep the oldest copy of each duplicated link so the unique index can be built
+            db.session.execute(text(
+                "DELETE FROM job_result WHERE id NOT IN "
+                "(SELECT MIN(id) FROM job_result GROUP BY user_id, link)"
+            ))
+            db.session.commit()
+        
+        for index in list(SearchConfig.__table__.indexes) + list(JobResult.__table__.indexes):
+            index.create(db.engine, checkfirst=True)
+    except Exception as e:
+        logger.error(f"Error creating database indexes: {e}")
+
+# Serializes the startup schema upgrade between the processes on a host
+SCHEMA_LOCK_FILE = os.environ.get('SCHEMA_LOCK_FILE', os.path.join(app.instance_path, 'schema.lock'))
+
+def upgrade_database_on_startup():
+    """Run create_tables() before this process serves anything
+
+    Runs at import, so it covers python app.py, run.py and gunicorn app:app alike.
+    Workers take the lock in turn: the first applies the upgrade and the rest find
+    nothing left to do.
+    """
+    os.makedirs(os.path.dirname(SCHEMA_LOCK_FILE), exist_ok=True)
+    with open(SCHEMA_LOCK_FILE, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)  # released when the file closes
+        with app.app_context():
+            create_tables()
+
+upgrade_database_on_startup()
+if _scheduler_lock:
+    # Only the process running jobs rewrites them into the shared store
+    schedule_user_searches_in_background()
 
 # Cleanup scheduler on exit
 atexit.register(lambda: scheduler.shutdown())
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-        schedule_user_searches()
-    
     # Get port from environment variable or default to 8002
     port = int(os.environ.get('PORT', 8002))
     debug = os.environ.get('FLASK_ENV') != 'production'